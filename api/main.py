@@ -1,5 +1,9 @@
+import asyncio
 from fastapi import FastAPI
 from .routes import router
+from schedule_manager.routes import router as schedule_router
+from schedule_manager.calendar_service import calendar_sync, CALENDAR_SYNC_RENEWAL_INTERVAL, CALENDAR_SYNC_LOCK_FILE
+from schedule_manager.calendar_sync import acquire_single_worker_lock
 
 app = FastAPI(
     title="Automated fine-tune model with Google Calendar and Google Meets scheduler for business use case",
@@ -8,3 +12,14 @@ app = FastAPI(
 )
 
 app.include_router(router)
+app.include_router(schedule_router)
+
+@app.on_event("startup")
+async def start_calendar_channel_renewal():
+    """
+    Keeps calendar watch channels renewed so push notifications do not silently stop.
+    Refuses to start a second worker while calendar sync is enabled.
+    """
+    if calendar_sync is not None:
+        app.state.calendar_sync_lock = acquire_single_worker_lock(CALENDAR_SYNC_LOCK_FILE)
+        asyncio.ensure_future(calendar_sync.renew_periodically(CALENDAR_SYNC_RENEWAL_INTERVAL))
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Dict
+import asyncio
 import datetime
+import time
 
 from finetuning.meeting_scheduler import llm, process_query_with_watsonx
+from finetuning.llm_scheduler import llm_scheduler, LLMOverloadedError, INTERACTIVE
+from .speculation import speculation_budget
 
 # Creating a router for API endpoints
 router = APIRouter()
@@ -22,6 +27,8 @@ async def process_user_query(request: UserRequest, conversation_history: List[Di
     If so, it uses the Watsonx model to analyze the entire conversation history to infer
     preferred meeting dates and times. For non-meeting-related queries, it processes
     the input and determines if it relates to company policies or provides a generic response.
+    When speculation is enabled and within budget, the non-meeting answer is started
+    alongside classification and cancelled if the query turns out to be about a meeting.
 
     Args:
         request (UserRequest): The data model containing the user's query.
@@ -36,42 +43,95 @@ async def process_user_query(request: UserRequest, conversation_history: List[Di
         Is the following user query related to scheduling a meeting? Respond with "Yes" or "No".
         Query: {request.user_input}
         """
+        if speculation_budget.try_acquire(llm_scheduler.metrics()[INTERACTIVE]["queue_depth"]):
+            return {"response": await answer_speculatively(request, conversation_history, user_prompt)}
+
         # Classify the query type using Watsonx
-        is_meeting_related = process_query_with_watsonx(user_prompt).strip().lower() == "yes"
+        classification = await llm_scheduler.run(INTERACTIVE, process_query_with_watsonx, user_prompt)
+        is_meeting_related = classification.strip().lower() == "yes"
 
         if is_meeting_related:
-            # Generate a detailed prompt to analyze the entire conversation history
-            conversation_context = "\n".join(
-                [f"{msg['role']}: {msg['content']}" for msg in conversation_history]
-            )
-            detailed_prompt = f"""
-            The user wants to schedule a meeting. Based on the following conversation history, infer:
-            1. The user's preferred dates and times.
-            2. Any other participants and their availability.
-            3. Suggested meeting times if conflicts arise.
-
-            Conversation history:
-            {conversation_context}
-
-            Query: {request.user_input}
-            """
-            # Process the meeting scheduling logic with Watsonx
-            meeting_response = process_query_with_watsonx(detailed_prompt)
-            return {"response": meeting_response}
+            return {"response": await answer_meeting_query(request, conversation_history)}
         else:
-            # Process non-meeting-related queries
-            if "company policy" in request.user_input.lower() or "about the company" in request.user_input.lower():
-                # Ask a question about the company
-                return {"response": ask_about_company(request.user_input)}
-            else:
-                # Generic fallback response
-                generic_response = process_query_with_watsonx(request.user_input)
-                return {"response": generic_response}
+            return {"response": await answer_general_query(request.user_input)}
 
+    except LLMOverloadedError as e:
+        # Shed load quickly instead of queueing behind saturated Watsonx capacity
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         # Error handling and returning an HTTP 500 response in case of failure
         raise HTTPException(status_code=500, detail=f"An error occurred while processing the request: {str(e)}")
 
+async def answer_meeting_query(request: UserRequest, conversation_history: List[Dict[str, str]]) -> str:
+    """
+    Infers meeting preferences from the whole conversation history with Watsonx.
+    """
+    # Generate a detailed prompt to analyze the entire conversation history
+    conversation_context = "\n".join(
+        [f"{msg['role']}: {msg['content']}" for msg in conversation_history]
+    )
+    detailed_prompt = f"""
+    The user wants to schedule a meeting. Based on the following conversation history, infer:
+    1. The user's preferred dates and times.
+    2. Any other participants and their availability.
+    3. Suggested meeting times if conflicts arise.
+
+    Conversation history:
+    {conversation_context}
+
+    Query: {request.user_input}
+    """
+    # Process the meeting scheduling logic with Watsonx
+    return await llm_scheduler.run(INTERACTIVE, process_query_with_watsonx, detailed_prompt)
+
+async def answer_general_query(user_input: str) -> str:
+    """
+    Answers non-meeting queries from the company knowledge base or with a generic response.
+    """
+    if "company policy" in user_input.lower() or "about the company" in user_input.lower():
+        # Ask a question about the company
+        return await llm_scheduler.run(INTERACTIVE, ask_about_company, user_input)
+    # Generic fallback response
+    return await llm_scheduler.run(INTERACTIVE, process_query_with_watsonx, user_input)
+
+async def answer_speculatively(request: UserRequest, conversation_history: List[Dict[str, str]], user_prompt: str) -> str:
+    """
+    Runs intent classification and the non-meeting answer concurrently, then keeps
+    the answer or cancels it once the intent is known.
+    """
+    started = time.monotonic()
+
+    async def timed_answer():
+        result = await answer_general_query(request.user_input)
+        return result, time.monotonic() - started
+
+    answer = asyncio.ensure_future(timed_answer())
+    try:
+        classification = await llm_scheduler.run(INTERACTIVE, process_query_with_watsonx, user_prompt)
+    except BaseException:
+        answer.cancel()
+        raise
+    classified_after = time.monotonic() - started
+
+    if classification.strip().lower() == "yes":
+        # The speculative answer is not needed; drop it and retrieve any error it raised
+        answer.cancel()
+        answer.add_done_callback(lambda task: task.cancelled() or task.exception())
+        speculation_budget.record_wasted()
+        return await answer_meeting_query(request, conversation_history)
+
+    response, answered_after = await answer
+    # Sequentially the answer would only have started after classification
+    speculation_budget.record_used(min(classified_after, answered_after))
+    return response
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Exports LLM scheduler queue depth and wait time, and speculation outcomes, in the Prometheus text format.
+    """
+    return llm_scheduler.render_prometheus() + speculation_budget.render_prometheus()
+
 def ask_about_company(query: str) -> str:
     """
     Processes questions related to the company's policies, goals, or general information.
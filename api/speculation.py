@@ -0,0 +1,89 @@
+import collections
+import threading
+import time
+from typing import Deque, Optional
+from .utils import load_config
+
+
+class SpeculationBudget:
+    """
+    Decides when /process-user-query may answer speculatively and tracks the payoff.
+
+    A speculative request starts the answer call alongside intent classification, so
+    each speculation costs one extra upstream call when the intent turns out to be
+    a meeting request. The budget caps speculations per minute and skips speculation
+    while interactive LLM work is already queueing.
+    """
+
+    def __init__(self, enabled: bool = False, max_per_minute: int = 60, max_queue_depth: int = 0):
+        self.enabled = enabled
+        self.max_per_minute = max_per_minute
+        self.max_queue_depth = max_queue_depth
+        self._lock = threading.Lock()
+        self._recent: Deque[float] = collections.deque()
+        self.stats = {
+            "speculated": 0,
+            "used": 0,
+            "wasted": 0,
+            "skipped": 0,
+            "latency_saved_seconds_sum": 0.0,
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SpeculationBudget":
+        settings = config.get("speculation", {})
+        return cls(
+            enabled=settings.get("enabled", False),
+            max_per_minute=settings.get("max_per_minute", 60),
+            max_queue_depth=settings.get("max_queue_depth", 0),
+        )
+
+    def try_acquire(self, queue_depth: int = 0, now: Optional[float] = None) -> bool:
+        """
+        Returns True and spends budget if this request may speculate.
+        """
+        if not self.enabled:
+            return False
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if queue_depth > self.max_queue_depth or len(self._recent) >= self.max_per_minute:
+                self.stats["skipped"] += 1
+                return False
+            self._recent.append(now)
+            self.stats["speculated"] += 1
+            return True
+
+    def record_used(self, latency_saved: float) -> None:
+        with self._lock:
+            self.stats["used"] += 1
+            self.stats["latency_saved_seconds_sum"] += latency_saved
+
+    def record_wasted(self) -> None:
+        with self._lock:
+            self.stats["wasted"] += 1
+
+    def render_prometheus(self) -> str:
+        """
+        Renders speculation outcomes in the Prometheus text exposition format.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+        lines = [
+            "# HELP llm_speculation_total Speculative answer calls by outcome.",
+            "# TYPE llm_speculation_total counter",
+        ]
+        for outcome in ("speculated", "used", "wasted", "skipped"):
+            lines.append(f'llm_speculation_total{{outcome="{outcome}"}} {stats[outcome]}')
+        lines += [
+            "# HELP llm_speculation_latency_saved_seconds_sum Latency saved by overlapping answer and classification.",
+            "# TYPE llm_speculation_latency_saved_seconds_sum counter",
+            f"llm_speculation_latency_saved_seconds_sum {stats['latency_saved_seconds_sum']}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+config = load_config('config/config.yaml')
+
+speculation_budget = SpeculationBudget.from_config(config)
@@ -0,0 +1,68 @@
+"""
+Benchmark for cohort scheduling on packed availability bitmaps.
+
+Usage: python -m benchmarks.bench_availability_matrix [--users 1200] [--sessions 200]
+"""
+import argparse
+import datetime
+import time
+
+import numpy as np
+
+from schedule_manager.availability_matrix import AvailabilityMatrix, SessionRequest, assign_sessions
+
+
+def build_random_matrix(n_users: int, days: int, slot_minutes: int, busy_ratio: float, seed: int) -> AvailabilityMatrix:
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2025, 1, 6)
+    matrix = AvailabilityMatrix(
+        [f"user{i}@domain.com" for i in range(n_users)],
+        start, start + datetime.timedelta(days=days), slot_minutes,
+    )
+    free = rng.random((n_users, matrix.n_slots)) >= busy_ratio
+    matrix.bits = np.packbits(free, axis=1)
+    return matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1200)
+    parser.add_argument("--mentors", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--days", type=int, default=21)
+    parser.add_argument("--slot-minutes", type=int, default=30)
+    parser.add_argument("--busy-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    matrix = build_random_matrix(args.users, args.days, args.slot_minutes, args.busy_ratio, args.seed)
+    mentors = matrix.user_ids[:args.mentors]
+    hires = matrix.user_ids[args.mentors:]
+
+    start = time.perf_counter()
+    matrix.all_free(hires)
+    matrix.free_counts(hires)
+    group_query = time.perf_counter() - start
+
+    sessions = [
+        SessionRequest(
+            session_id=f"session-{i}",
+            duration_minutes=60,
+            required=[mentors[i % len(mentors)]],
+            optional=list(rng.choice(hires, size=min(25, len(hires)), replace=False)),
+        )
+        for i in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    result = assign_sessions(matrix, sessions)
+    solve = time.perf_counter() - start
+
+    print(f"users={args.users} slots={matrix.n_slots} matrix_bytes={matrix.bits.nbytes}")
+    print(f"group AND + popcount over {len(hires)} users: {group_query * 1000:.2f} ms")
+    print(f"assigned {len(result['assignments'])}/{args.sessions} sessions "
+          f"({len(result['unscheduled'])} unscheduled) in {solve * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
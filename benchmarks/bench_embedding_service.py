@@ -0,0 +1,133 @@
+"""
+Benchmark for the shared embedding service.
+
+Compares fp32 and int8-quantized CPU models (throughput, agreement of the
+resulting vectors and of passage rankings on a held-out corpus), then measures query latency for concurrent single-query
+requests with and without micro-batching.
+
+Usage: python -m benchmarks.bench_embedding_service [--queries 512] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from finetuning.embedding_service import MODEL_NAME, MicroBatcher, load_model, make_encoder
+
+SAMPLE_QUERIES = [
+    "What is the company's remote work policy?",
+    "How many vacation days do new employees get?",
+    "Who do I contact about payroll questions?",
+    "What are the core values of the company?",
+    "How do I request access to the internal wiki?",
+    "When is the next onboarding session for engineers?",
+    "What is the process for expense reimbursement?",
+    "Where can I find the code of conduct?",
+]
+
+# Held-out retrieval corpus: passages written independently of the queries above,
+# including near-miss distractors, so int8 ranking changes show up as disagreement.
+CORPUS_PASSAGES = [
+    "Employees may work from home up to three days per week with their manager's approval.",
+    "Fully remote arrangements require a signed agreement with HR and a home office checklist.",
+    "Full-time staff accrue 25 days of paid leave per year, prorated in the first year.",
+    "Unused leave of up to five days can be carried over into the first quarter of the next year.",
+    "Sick leave is separate from annual leave and requires a doctor's note after three days.",
+    "Salary is paid on the last working day of each month; payslips are available in the HR portal.",
+    "Questions about tax deductions or bank details should be sent to the finance shared mailbox.",
+    "Our values are customer obsession, ownership, and learning in public.",
+    "The company was founded in 2012 and now operates offices in four countries.",
+    "Access to internal documentation is requested through the IT service desk with a manager approval.",
+    "New laptops are delivered on the first day and must be enrolled in device management.",
+    "Engineering onboarding cohorts start every other Monday and last two weeks.",
+    "Sales onboarding includes product certification and shadowing three customer calls.",
+    "Business expenses are submitted in the expense tool within 30 days with receipts attached.",
+    "Travel must be booked through the corporate travel agency to be reimbursed.",
+    "The code of conduct and anti-harassment policy are published in the employee handbook.",
+    "Security incidents must be reported to the security team within one hour of discovery.",
+    "Performance reviews take place twice a year, in June and December.",
+    "Parental leave is 16 weeks at full pay for all parents.",
+    "The cafeteria is open from 8am to 3pm on weekdays.",
+]
+
+
+def make_queries(n: int):
+    return [f"{SAMPLE_QUERIES[i % len(SAMPLE_QUERIES)]} (variant {i})" for i in range(n)]
+
+
+def throughput(encode, texts, batch_size: int = 64) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        encode(texts[i:i + batch_size])
+    return len(texts) / (time.perf_counter() - start)
+
+
+async def concurrent_latencies(embed, texts, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(text):
+        async with semaphore:
+            start = time.perf_counter()
+            await embed([text])
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(text) for text in texts))
+    return np.array(latencies)
+
+
+async def latency_comparison(encode, texts, concurrency: int, window_ms: float):
+    loop = asyncio.get_running_loop()
+
+    async def unbatched(batch):
+        return await loop.run_in_executor(None, encode, batch)
+
+    sequential = await concurrent_latencies(unbatched, texts, concurrency)
+    batcher = MicroBatcher(encode, window_ms=window_ms)
+    batcher.start()
+    batched = await concurrent_latencies(batcher.embed, texts, concurrency)
+    await batcher.stop()
+    return sequential, batched, batcher
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--window-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    texts = make_queries(args.queries)
+    fp32 = make_encoder(load_model(MODEL_NAME, quantize=False))
+    int8 = make_encoder(load_model(MODEL_NAME, quantize=True))
+
+    fp32_rate = throughput(fp32, texts)
+    int8_rate = throughput(int8, texts)
+    reference = np.array(fp32(texts))
+    quantized = np.array(int8(texts))
+    cosine = (reference * quantized).sum(axis=1)
+    # Retrieval agreement on the held-out corpus: does int8 rank the same passages as fp32?
+    fp32_scores = reference @ np.array(fp32(CORPUS_PASSAGES)).T
+    int8_scores = quantized @ np.array(int8(CORPUS_PASSAGES)).T
+    top1 = (fp32_scores.argmax(axis=1) == int8_scores.argmax(axis=1)).mean()
+    fp32_top3 = np.argsort(-fp32_scores, axis=1)[:, :3]
+    int8_top3 = np.argsort(-int8_scores, axis=1)[:, :3]
+    overlap3 = np.mean([len(set(a) & set(b)) / 3 for a, b in zip(fp32_top3, int8_top3)])
+
+    print(f"fp32: {fp32_rate:.0f} texts/s   int8: {int8_rate:.0f} texts/s   speedup x{int8_rate / fp32_rate:.2f}")
+    print(f"int8 vs fp32 cosine: mean {cosine.mean():.4f} min {cosine.min():.4f}")
+    print(f"retrieval over {len(CORPUS_PASSAGES)} held-out passages: top-1 agreement {top1:.1%}   top-3 overlap {overlap3:.1%}")
+
+    for name, encode in (("fp32", fp32), ("int8", int8)):
+        sequential, batched, batcher = asyncio.run(
+            latency_comparison(encode, texts, args.concurrency, args.window_ms)
+        )
+        print(f"{name} unbatched p50 {np.percentile(sequential, 50) * 1000:.1f} ms "
+              f"p95 {np.percentile(sequential, 95) * 1000:.1f} ms | micro-batched p50 "
+              f"{np.percentile(batched, 50) * 1000:.1f} ms p95 {np.percentile(batched, 95) * 1000:.1f} ms "
+              f"(avg batch {batcher.texts / max(1, batcher.batches):.1f})")
+
+
+if __name__ == "__main__":
+    main()
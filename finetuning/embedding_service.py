@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, List, Optional
+from langchain_core.embeddings import Embeddings
+from .utils import load_config
+
+logger = logging.getLogger(__name__)
+
+config = load_config('config/config.yaml')
+EMBEDDINGS_CONFIG = config.get('embeddings', {})
+
+MODEL_NAME = EMBEDDINGS_CONFIG.get('model_name', "sentence-transformers/all-MiniLM-L6-v2")
+SOCKET_PATH = EMBEDDINGS_CONFIG.get('socket_path', "/tmp/edvy-embeddings.sock")
+BATCH_WINDOW_MS = EMBEDDINGS_CONFIG.get('batch_window_ms', 5)
+MAX_BATCH_SIZE = EMBEDDINGS_CONFIG.get('max_batch_size', 64)
+QUANTIZE = EMBEDDINGS_CONFIG.get('quantize', False)
+REQUEST_TIMEOUT_SECONDS = EMBEDDINGS_CONFIG.get('request_timeout_seconds', 30)
+# Longest request line the sidecar accepts; clients split their requests well below it
+MAX_LINE_BYTES = 2 ** 24
+
+
+def load_model(model_name: str = MODEL_NAME, quantize: bool = QUANTIZE):
+    """
+    Loads the sentence-transformers model, optionally with int8 dynamic quantization
+    of its Linear layers for faster CPU inference.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    if quantize:
+        import torch
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def make_encoder(model, batch_size: int = MAX_BATCH_SIZE) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Wraps a model into a batch encode function returning normalized vectors.
+    Forward passes are capped at batch_size sequences to bound memory use.
+    """
+    def encode(texts: List[str]) -> List[List[float]]:
+        return model.encode(texts, batch_size=batch_size, normalize_embeddings=True).tolist()
+    return encode
+
+
+class MicroBatcher:
+    """
+    Groups concurrent embedding requests that arrive within a short window into a
+    single model call. Encoding runs on one background thread so the event loop
+    keeps accepting requests while a batch is in flight.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], List[List[float]]],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = MAX_BATCH_SIZE):
+        self.encode = encode
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.texts = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Queues texts for the next batch and waits for their vectors.
+        """
+        if not texts:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for request_texts, _ in pending for text in request_texts]
+            try:
+                vectors = await loop.run_in_executor(None, self.encode, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for request_texts, future in pending:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+
+async def serve(batcher: MicroBatcher, socket_path: str = SOCKET_PATH) -> asyncio.AbstractServer:
+    """
+    Starts the embedding sidecar on a Unix socket.
+
+    The protocol is one JSON object per line: {"texts": [...]} is answered with
+    {"embeddings": [[...], ...]} or {"error": "..."}.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The rest of an oversized line cannot be resynchronised, so report and close
+                    error = f"Request line exceeds {MAX_LINE_BYTES} bytes; send fewer texts per request."
+                    writer.write(json.dumps({"error": error}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    texts = json.loads(line)["texts"]
+                    response = {"embeddings": await batcher.embed(texts)}
+                except Exception as e:
+                    response = {"error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    batcher.start()
+    return await asyncio.start_unix_server(handle, path=socket_path, limit=MAX_LINE_BYTES)
+
+
+class EmbeddingClient(Embeddings):
+    """
+    LangChain embeddings backed by the per-host sidecar.
+
+    Requests are split into max_batch_size pieces. When the sidecar is unreachable,
+    too slow or drops the connection, that piece is embedded by a model loaded once
+    in this process; the sidecar is still tried first on every later request.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH, max_batch_size: int = MAX_BATCH_SIZE,
+                 timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._local_encode = None
+        self._local_lock = threading.Lock()
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps({"texts": texts}).encode() + b"\n")
+            with sock.makefile("rb") as stream:
+                response = json.loads(stream.readline())
+        if "error" in response:
+            raise RuntimeError(f"Embedding service error: {response['error']}")
+        return response["embeddings"]
+
+    def _embed_locally(self, texts: List[str]) -> List[List[float]]:
+        with self._local_lock:
+            if self._local_encode is None:
+                logger.warning(f"Loading {MODEL_NAME} in-process as a fallback for {self.socket_path}.")
+                self._local_encode = make_encoder(load_model(), self.max_batch_size)
+            return self._local_encode(texts)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        try:
+            return self._request(texts)
+        except (OSError, ValueError) as e:
+            # Covers a missing socket, refused or dropped connections, timeouts and truncated replies
+            logger.warning(f"Embedding service request failed ({e}); embedding in-process.")
+        return self._embed_locally(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.max_batch_size):
+            vectors.extend(self._embed_batch(texts[i:i + self.max_batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+# Shared client for ingestion and retrieval in this process
+embedding_client = EmbeddingClient()
+
+
+def wait_for_service(socket_path: str = SOCKET_PATH, timeout: float = 60) -> bool:
+    """
+    Waits until the sidecar accepts connections, giving up after timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+            return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the shared query embedding service.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--wait", type=float, metavar="SECONDS",
+                        help="Only wait up to SECONDS for a running service to accept connections, then exit.")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--quantize", action="store_true", default=QUANTIZE)
+    parser.add_argument("--window-ms", type=float, default=BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.wait is not None:
+        # Never blocks startup for good: clients fall back to an in-process model
+        if not wait_for_service(args.socket, args.wait):
+            logger.warning(f"Embedding service not ready on {args.socket} after {args.wait}s; continuing without it.")
+        return
+
+    encode = make_encoder(load_model(args.model, args.quantize), args.max_batch_size)
+
+    async def run():
+        batcher = MicroBatcher(encode, args.window_ms, args.max_batch_size)
+        server = await serve(batcher, args.socket)
+        logger.info(f"Embedding service for {args.model} listening on {args.socket} (int8={args.quantize}).")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
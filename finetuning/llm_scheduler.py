@@ -0,0 +1,262 @@
+import asyncio
+import collections
+import concurrent.futures
+import math
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional
+from .utils import load_config
+
+# Priority classes, highest priority first
+INTERACTIVE = "interactive"
+AGENT = "agent"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, AGENT, BACKGROUND)
+
+DEFAULT_CLASS_LIMITS = {
+    INTERACTIVE: {"max_concurrency": 8, "max_queue": 32, "timeout_seconds": 30},
+    AGENT: {"max_concurrency": 4, "max_queue": 16, "timeout_seconds": 60},
+    BACKGROUND: {"max_concurrency": 2, "max_queue": 64, "timeout_seconds": 600},
+}
+
+
+class LLMOverloadedError(RuntimeError):
+    """
+    Raised when LLM work cannot be admitted; carries a Retry-After hint in seconds.
+    """
+
+    def __init__(self, priority: str, reason: str, retry_after: int):
+        super().__init__(f"LLM capacity exhausted for {priority} work: {reason}")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    """
+    A queued unit of LLM work waiting for a capacity slot.
+    """
+
+    def __init__(self, priority: str, deadline: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = threading.Event() if loop is None else None
+        self.error: Optional[Exception] = None
+
+    def resolve(self, error: Optional[Exception] = None) -> None:
+        self.error = error
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(self._set_future)
+        else:
+            self.event.set()
+
+    def _set_future(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class LLMScheduler:
+    """
+    Central admission point for Watsonx calls.
+
+    Work is queued per priority class in bounded FIFO queues. A freed slot always
+    goes to the highest-priority class that is under its own concurrency limit, so
+    background jobs cannot starve interactive users. Work is rejected up front when
+    the queue is full or when the estimated wait would miss its deadline.
+    """
+
+    def __init__(self, max_concurrency: int = 8, classes: Optional[Dict[str, dict]] = None):
+        self.max_concurrency = max_concurrency
+        self.classes = {priority: dict(DEFAULT_CLASS_LIMITS[priority]) for priority in PRIORITIES}
+        for priority, limits in (classes or {}).items():
+            if priority not in self.classes:
+                raise ValueError(f"Unknown LLM priority class {priority}.")
+            self.classes[priority].update(limits)
+
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._queues: Dict[str, Deque[_Ticket]] = {p: collections.deque() for p in PRIORITIES}
+        self._active: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        # Exponentially weighted service time per class, used for wait estimates
+        self._service_time: Dict[str, float] = {p: 1.0 for p in PRIORITIES}
+        self._stats: Dict[str, Dict[str, float]] = {
+            p: {"admitted": 0, "rejected": 0, "expired": 0, "dispatched": 0, "completed": 0,
+                "wait_seconds_sum": 0.0, "wait_seconds_max": 0.0}
+            for p in PRIORITIES
+        }
+
+    @classmethod
+    def from_config(cls, config: dict) -> "LLMScheduler":
+        settings = config.get("llm_scheduler", {})
+        return cls(settings.get("max_concurrency", 8), settings.get("classes"))
+
+    def _capacity(self, priority: str) -> int:
+        return max(1, min(self.max_concurrency, self.classes[priority]["max_concurrency"]))
+
+    def _estimated_wait(self, priority: str) -> float:
+        """
+        Estimates queueing delay from the work already ahead of a new ticket.
+        """
+        rank = PRIORITIES.index(priority)
+        ahead = sum(len(self._queues[p]) for p in PRIORITIES[:rank + 1])
+        free = self.max_concurrency - sum(self._active.values())
+        if free > 0 and self._active[priority] < self._capacity(priority) and ahead == 0:
+            return 0.0
+        return (ahead + 1) / self._capacity(priority) * self._service_time[priority]
+
+    def _admit(self, priority: str, timeout: Optional[float], loop=None) -> _Ticket:
+        if priority not in self.classes:
+            raise ValueError(f"Unknown LLM priority class {priority}.")
+        limits = self.classes[priority]
+        now = time.monotonic()
+        deadline = now + (timeout if timeout is not None else limits["timeout_seconds"])
+
+        with self._lock:
+            estimated_wait = self._estimated_wait(priority)
+            retry_after = max(1, math.ceil(estimated_wait))
+            if len(self._queues[priority]) >= limits["max_queue"]:
+                self._stats[priority]["rejected"] += 1
+                raise LLMOverloadedError(priority, "queue is full", retry_after)
+            if now + estimated_wait + self._service_time[priority] > deadline:
+                self._stats[priority]["rejected"] += 1
+                raise LLMOverloadedError(priority, "deadline cannot be met", retry_after)
+
+            ticket = _Ticket(priority, deadline, loop)
+            self._queues[priority].append(ticket)
+            self._stats[priority]["admitted"] += 1
+            self._dispatch()
+        return ticket
+
+    def _dispatch(self) -> None:
+        """
+        Hands free slots to queued tickets in priority order. Caller holds the lock.
+        """
+        now = time.monotonic()
+        while sum(self._active.values()) < self.max_concurrency:
+            for priority in PRIORITIES:
+                queue = self._queues[priority]
+                while queue and queue[0].deadline <= now:
+                    expired = queue.popleft()
+                    self._stats[priority]["expired"] += 1
+                    expired.resolve(LLMOverloadedError(priority, "deadline expired while queued", 1))
+                if queue and self._active[priority] < self._capacity(priority):
+                    ticket = queue.popleft()
+                    self._active[priority] += 1
+                    wait = now - ticket.enqueued_at
+                    self._stats[priority]["dispatched"] += 1
+                    self._stats[priority]["wait_seconds_sum"] += wait
+                    self._stats[priority]["wait_seconds_max"] = max(self._stats[priority]["wait_seconds_max"], wait)
+                    ticket.resolve()
+                    break
+            else:
+                return
+
+    def _release(self, priority: str, service_time: Optional[float]) -> None:
+        with self._lock:
+            self._active[priority] -= 1
+            if service_time is not None:
+                self._stats[priority]["completed"] += 1
+                self._service_time[priority] = 0.8 * self._service_time[priority] + 0.2 * service_time
+            self._dispatch()
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        """
+        Removes a ticket whose caller gave up, or frees its slot if it was already granted.
+        """
+        with self._lock:
+            try:
+                self._queues[ticket.priority].remove(ticket)
+                return
+            except ValueError:
+                pass
+        if ticket.error is None:
+            self._release(ticket.priority, None)
+
+    def call(self, priority: str, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs a blocking LLM call under the scheduler from synchronous code.
+        """
+        ticket = self._admit(priority, timeout)
+        if not ticket.event.wait(max(0.0, ticket.deadline - time.monotonic())):
+            self._withdraw(ticket)
+            raise LLMOverloadedError(priority, "deadline expired while queued", 1)
+        if ticket.error is not None:
+            raise ticket.error
+
+        started = time.monotonic()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._release(priority, time.monotonic() - started)
+
+    async def run(self, priority: str, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Runs a blocking LLM call under the scheduler from async code without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        ticket = self._admit(priority, timeout, loop)
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), max(0.0, ticket.deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._withdraw(ticket)
+            raise LLMOverloadedError(priority, "deadline expired while queued", 1)
+        except asyncio.CancelledError:
+            self._withdraw(ticket)
+            raise
+        if ticket.error is not None:
+            raise ticket.error
+
+        started = time.monotonic()
+        # The slot is released when the call really finishes, even if the caller is cancelled
+        # first, because a blocking upstream request cannot be interrupted mid-flight.
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda _: self._release(priority, time.monotonic() - started))
+        return await asyncio.wrap_future(future)
+
+    def metrics(self) -> dict:
+        """
+        Returns queue depth, in-flight work and wait statistics per priority class.
+        """
+        with self._lock:
+            return {
+                priority: {
+                    "queue_depth": len(self._queues[priority]),
+                    "active": self._active[priority],
+                    "service_time_seconds": self._service_time[priority],
+                    **self._stats[priority],
+                }
+                for priority in PRIORITIES
+            }
+
+    def render_prometheus(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        metrics = self.metrics()
+        series = [
+            ("llm_queue_depth", "gauge", "queue_depth", "Queued LLM requests."),
+            ("llm_active_requests", "gauge", "active", "In-flight LLM requests."),
+            ("llm_admitted_total", "counter", "admitted", "LLM requests admitted to a queue."),
+            ("llm_rejected_total", "counter", "rejected", "LLM requests shed at admission."),
+            ("llm_expired_total", "counter", "expired", "LLM requests that expired while queued."),
+            ("llm_completed_total", "counter", "completed", "LLM requests completed."),
+            ("llm_queue_wait_seconds_sum", "counter", "wait_seconds_sum", "Total time dispatched requests spent queued."),
+            ("llm_queue_wait_seconds_count", "counter", "dispatched", "LLM requests dispatched from a queue."),
+            ("llm_queue_wait_seconds_max", "gauge", "wait_seconds_max", "Longest time spent queued."),
+        ]
+        lines = []
+        for name, kind, key, help_text in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for priority in PRIORITIES:
+                lines.append(f'{name}{{priority="{priority}"}} {metrics[priority][key]}')
+        return "\n".join(lines) + "\n"
+
+
+config = load_config('config/config.yaml')
+
+# Shared scheduler for every Watsonx call made by this process
+llm_scheduler = LLMScheduler.from_config(config)
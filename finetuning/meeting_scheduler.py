@@ -5,6 +5,7 @@ from langchain.prompts import PromptTemplate
 from langchain.agents import Tool
 from langchain.agents import create_react_agent
 from .utils import load_config
+from .llm_scheduler import llm_scheduler, AGENT
 from schedule_manager.calendar_service import check_availability, schedule_meeting_event, check_group_availability
 
 # Load configuration for Watsonx
@@ -56,8 +57,9 @@ class WatsonxLLM(LLM, Runnable):
     def _generate(self, prompt: str, stop: list = None) -> str:
         """
         Generate text using the Watsonx API by sending the prompt and getting the result.
+        Agent tool loops share Watsonx capacity with interactive traffic, so they go through the scheduler.
         """
-        return process_query_with_watsonx(prompt)
+        return llm_scheduler.call(AGENT, process_query_with_watsonx, prompt)
 
     @property
     def _llm_type(self) -> str:
@@ -13,6 +13,7 @@ from langchain.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from yaml import safe_load
 from .utils import load_config
+from .embedding_service import embedding_client
 
 config = load_config("config/config.yaml")
 WATSONX_API_URL = f"https://{config['watsonx']['region']}.ml.cloud.ibm.com/ml/v1/text/generation?version=2023-05-29"
@@ -70,7 +71,8 @@ async def upload_documents(
 
     # Step 3: Build vector store using FAISS
     try:
-        vector_store = FAISS.from_documents(chunks, embedding_model="sentence-transformers/all-MiniLM-L6-v2")
+        # Embeddings come from the shared per-host service instead of a model loaded per run
+        vector_store = FAISS.from_documents(chunks, embedding_client)
         logger.info("Vector store created successfully.")
     except Exception as e:
         logger.error(f"Failed to create vector store: {e}")
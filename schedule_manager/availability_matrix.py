@@ -0,0 +1,284 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import datetime
+
+import numpy as np
+
+
+def to_naive_utc(value: datetime.datetime) -> datetime.datetime:
+    """
+    Converts an aware datetime to naive UTC, the convention used by the calendar service.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _parse_rfc3339(value: str) -> datetime.datetime:
+    """
+    Parses a Google Calendar timestamp into a naive UTC datetime.
+    """
+    return to_naive_utc(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+
+# Limits that keep a matrix, and the int32 window arrays derived from it, bounded in memory
+MIN_SLOT_MINUTES = 5
+MAX_SLOTS = 8640  # 90 days of 15-minute slots
+MAX_CELLS = 10_000_000  # users x slots
+
+
+def count_slots(horizon_start: datetime.datetime, horizon_end: datetime.datetime,
+                slot_minutes: int, n_users: int = 0) -> int:
+    """
+    Validates a horizon and returns its number of whole slots.
+
+    A trailing partial slot is dropped: it would extend past horizon_end, where
+    free/busy data was never fetched, and would always look free.
+    """
+    if horizon_end <= horizon_start:
+        raise ValueError("Horizon end must be after horizon start.")
+    if slot_minutes < MIN_SLOT_MINUTES:
+        raise ValueError(f"Slot size must be at least {MIN_SLOT_MINUTES} minutes.")
+    n_slots = (horizon_end - horizon_start) // datetime.timedelta(minutes=slot_minutes)
+    if n_slots == 0:
+        raise ValueError("Horizon must span at least one slot.")
+    if n_slots > MAX_SLOTS:
+        raise ValueError(f"Horizon spans {n_slots} slots; the maximum is {MAX_SLOTS}.")
+    if n_users * n_slots > MAX_CELLS:
+        raise ValueError(f"{n_users} users over {n_slots} slots exceeds the limit of {MAX_CELLS} cells.")
+    return n_slots
+
+
+class AvailabilityMatrix:
+    """
+    Packed per-user availability bitmaps over a fixed horizon of equal-size slots.
+
+    Each row holds one bit per slot (1 = free, 0 = busy), packed into uint8 words
+    with numpy so that group queries become vectorized AND/popcount operations.
+    """
+
+    def __init__(self, user_ids: List[str], horizon_start: datetime.datetime,
+                 horizon_end: datetime.datetime, slot_minutes: int = 30):
+        self.user_ids = list(dict.fromkeys(user_ids))
+        self.n_slots = count_slots(horizon_start, horizon_end, slot_minutes, len(self.user_ids))
+        self.horizon_start = horizon_start
+        self.horizon_end = horizon_end
+        self.slot = datetime.timedelta(minutes=slot_minutes)
+        self.index: Dict[str, int] = {user_id: i for i, user_id in enumerate(self.user_ids)}
+
+        free = np.ones((len(self.user_ids), self.n_slots), dtype=bool)
+        self.bits = np.packbits(free, axis=1)
+
+    @classmethod
+    def from_freebusy(cls, freebusy: dict, horizon_start: datetime.datetime,
+                      horizon_end: datetime.datetime, slot_minutes: int = 30) -> "AvailabilityMatrix":
+        """
+        Builds a matrix from a Google Calendar freebusy response
+        ({"calendars": {calendar_id: {"busy": [{"start": ..., "end": ...}]}}}).
+
+        Calendars that Google could not read come back with "errors" and an empty
+        busy list; their availability is unknown, so they are rejected rather than
+        treated as free.
+        """
+        calendars = freebusy.get('calendars', {})
+        unreadable = [calendar_id for calendar_id, info in calendars.items() if info.get('errors')]
+        if unreadable:
+            raise ValueError(f"Availability is unknown for calendars: {', '.join(unreadable)}.")
+        matrix = cls(list(calendars), horizon_start, horizon_end, slot_minutes)
+        for calendar_id, info in calendars.items():
+            for interval in info.get('busy', []):
+                matrix.mark_busy(calendar_id, _parse_rfc3339(interval['start']),
+                                 _parse_rfc3339(interval['end']))
+        return matrix
+
+    def slot_range(self, start_time: datetime.datetime, end_time: datetime.datetime) -> Tuple[int, int]:
+        """
+        Returns the [first, last) slot indices touched by a time range, clipped to the horizon.
+        """
+        first = (start_time - self.horizon_start) // self.slot
+        last = -(-(end_time - self.horizon_start) // self.slot)
+        return max(0, int(first)), min(self.n_slots, int(last))
+
+    def slot_start(self, slot_index: int) -> datetime.datetime:
+        """
+        Returns the start time of a slot.
+        """
+        return self.horizon_start + slot_index * self.slot
+
+    def _rows(self, user_ids: Iterable[str]) -> np.ndarray:
+        try:
+            return np.array([self.index[user_id] for user_id in user_ids], dtype=np.intp)
+        except KeyError as e:
+            raise ValueError(f"User {e.args[0]} is not part of the availability matrix.")
+
+    def free_slots(self, user_id: str) -> np.ndarray:
+        """
+        Returns a boolean array with one entry per slot for a single user.
+        """
+        row = self._rows([user_id])[0]
+        return np.unpackbits(self.bits[row], count=self.n_slots).astype(bool)
+
+    def mark_busy(self, user_id: str, start_time: datetime.datetime, end_time: datetime.datetime) -> None:
+        """
+        Marks every slot overlapping the given range as busy for a user.
+        """
+        first, last = self.slot_range(start_time, end_time)
+        if first >= last:
+            return
+        self.mark_slots_busy([user_id], first, last)
+
+    def mark_slots_busy(self, user_ids: Iterable[str], first: int, last: int) -> None:
+        """
+        Marks slots [first, last) as busy for several users at once.
+        """
+        rows = self._rows(user_ids)
+        if rows.size == 0:
+            return
+        free = np.unpackbits(self.bits[rows], axis=1, count=self.n_slots)
+        free[:, first:last] = 0
+        self.bits[rows] = np.packbits(free, axis=1)
+
+    def all_free(self, user_ids: Iterable[str]) -> np.ndarray:
+        """
+        Returns a boolean array of slots where every given user is free (bitwise AND).
+        """
+        rows = self._rows(user_ids)
+        if rows.size == 0:
+            return np.ones(self.n_slots, dtype=bool)
+        packed = np.bitwise_and.reduce(self.bits[rows], axis=0)
+        return np.unpackbits(packed, count=self.n_slots).astype(bool)
+
+    def free_counts(self, user_ids: Iterable[str]) -> np.ndarray:
+        """
+        Returns, for every slot, how many of the given users are free (popcount per column).
+        """
+        rows = self._rows(user_ids)
+        if rows.size == 0:
+            return np.zeros(self.n_slots, dtype=np.int64)
+        return np.unpackbits(self.bits[rows], axis=1, count=self.n_slots).sum(axis=0, dtype=np.int64)
+
+    def window_free(self, user_ids: Iterable[str], length: int) -> np.ndarray:
+        """
+        Returns a (users x start slots) boolean matrix telling whether each user is free
+        for `length` consecutive slots starting at each position.
+        """
+        rows = self._rows(user_ids)
+        n_starts = max(0, self.n_slots - length + 1)
+        if rows.size == 0 or n_starts == 0:
+            return np.zeros((rows.size, n_starts), dtype=bool)
+        busy = 1 - np.unpackbits(self.bits[rows], axis=1, count=self.n_slots).astype(np.int32)
+        cumulative = np.zeros((rows.size, self.n_slots + 1), dtype=np.int32)
+        np.cumsum(busy, axis=1, out=cumulative[:, 1:])
+        return (cumulative[:, length:] - cumulative[:, :n_starts]) == 0
+
+    def best_windows(self, required: List[str], duration_minutes: int,
+                     optional: Optional[List[str]] = None, limit: int = 5) -> List[dict]:
+        """
+        Ranks start times where all required users are free for the whole duration,
+        ordered by how many optional users can also attend.
+        """
+        length = int(-(-datetime.timedelta(minutes=duration_minutes) // self.slot))
+        starts = self._feasible_starts(required, length)
+        if starts.size == 0:
+            return []
+        optional = optional or []
+        if optional:
+            scores = self.window_free(optional, length)[:, starts].sum(axis=0)
+        else:
+            scores = np.zeros(starts.size, dtype=np.int64)
+        order = np.argsort(-scores, kind='stable')[:limit]
+        return [
+            {
+                "start": self.slot_start(int(starts[i])),
+                "end": self.slot_start(int(starts[i]) + length),
+                "optional_free": int(scores[i]),
+            }
+            for i in order
+        ]
+
+    def _feasible_starts(self, required: List[str], length: int) -> np.ndarray:
+        if length <= 0 or length > self.n_slots:
+            return np.array([], dtype=np.intp)
+        if not required:
+            return np.arange(self.n_slots - length + 1)
+        return np.flatnonzero(self.window_free(required, length).all(axis=0))
+
+    def copy(self) -> "AvailabilityMatrix":
+        """
+        Returns an independent copy of the matrix.
+        """
+        clone = object.__new__(AvailabilityMatrix)
+        clone.__dict__.update(self.__dict__)
+        clone.user_ids = list(self.user_ids)
+        clone.index = dict(self.index)
+        clone.bits = self.bits.copy()
+        return clone
+
+
+@dataclass
+class SessionRequest:
+    """
+    A session to place: required attendees must all be free, optional attendees are
+    added when they are free for the chosen window.
+    """
+    session_id: str
+    duration_minutes: int
+    required: List[str]
+    optional: List[str] = field(default_factory=list)
+
+
+@dataclass
+class SessionAssignment:
+    session_id: str
+    start: datetime.datetime
+    end: datetime.datetime
+    attendees: List[str]
+
+
+def assign_sessions(matrix: AvailabilityMatrix, sessions: List[SessionRequest]) -> dict:
+    """
+    Places many sessions at once without double-booking anyone.
+
+    Sessions are placed greedily, most constrained first (fewest feasible start
+    slots, then most required attendees). Each session takes the start slot with
+    the most free optional attendees, and everyone attending is then marked busy
+    in a working copy of the matrix so later sessions cannot overlap them.
+    """
+    working = matrix.copy()
+    lengths = {
+        session.session_id: int(-(-datetime.timedelta(minutes=session.duration_minutes) // working.slot))
+        for session in sessions
+    }
+
+    def constraint(session: SessionRequest) -> Tuple[int, int]:
+        feasible = working._feasible_starts(session.required, lengths[session.session_id])
+        return feasible.size, -len(session.required)
+
+    assignments: List[SessionAssignment] = []
+    unscheduled: List[str] = []
+    for session in sorted(sessions, key=constraint):
+        length = lengths[session.session_id]
+        starts = working._feasible_starts(session.required, length)
+        if starts.size == 0:
+            unscheduled.append(session.session_id)
+            continue
+
+        optional = [user_id for user_id in session.optional if user_id not in session.required]
+        if optional:
+            optional_free = working.window_free(optional, length)[:, starts]
+            best = int(np.argmax(optional_free.sum(axis=0)))
+            joining = [user_id for user_id, free in zip(optional, optional_free[:, best]) if free]
+        else:
+            best, joining = 0, []
+
+        first = int(starts[best])
+        attendees = list(session.required) + joining
+        working.mark_slots_busy(attendees, first, first + length)
+        assignments.append(SessionAssignment(
+            session_id=session.session_id,
+            start=working.slot_start(first),
+            end=working.slot_start(first + length),
+            attendees=attendees,
+        ))
+
+    return {"assignments": assignments, "unscheduled": unscheduled, "matrix": working}
@@ -2,6 +2,8 @@ from typing import List
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from .utils import load_config
+from .availability_matrix import AvailabilityMatrix
+from .calendar_sync import CalendarSync
 import yaml
 import datetime
 import os
@@ -19,10 +21,29 @@ credentials = service_account.Credentials.from_service_account_file(
 # Build the Google Calendar API service
 calendar_service = build('calendar', 'v3', credentials=credentials)
 
+# The freebusy endpoint accepts at most 50 calendars per query
+FREEBUSY_MAX_CALENDARS = 50
+
+# Optional push-notification sync that answers availability from a local store
+CALENDAR_SYNC_CONFIG = config.get('calendar_sync', {})
+calendar_sync = CalendarSync(
+    calendar_service,
+    webhook_url=CALENDAR_SYNC_CONFIG.get('webhook_url', ''),
+    channel_token=CALENDAR_SYNC_CONFIG.get('channel_token', ''),
+    channel_ttl_seconds=CALENDAR_SYNC_CONFIG.get('channel_ttl_seconds', 7 * 24 * 3600),
+) if CALENDAR_SYNC_CONFIG.get('enabled') else None
+CALENDAR_SYNC_RENEWAL_INTERVAL = CALENDAR_SYNC_CONFIG.get('renewal_interval_seconds', 900)
+CALENDAR_SYNC_LOCK_FILE = CALENDAR_SYNC_CONFIG.get('lock_file', '/tmp/edvy-calendar-sync.lock')
+
 def check_availability(calendar_id: str, start_time: datetime.datetime, end_time: datetime.datetime) -> bool:
     """
     Checks if a user is available for the given time range.
     """
+    if calendar_sync is not None:
+        local = calendar_sync.is_free(calendar_id, start_time, end_time)
+        if local is not None:
+            return local
+
     events = calendar_service.events().list(
         calendarId=calendar_id,
         timeMin=start_time.isoformat() + 'Z',
@@ -65,3 +86,33 @@ def check_group_availability(group_members: List[str], start_time: datetime.date
         if not check_availability(calendar_id, start_time, end_time):
             return False
     return True
+
+def fetch_freebusy(calendar_ids: List[str], start_time: datetime.datetime, end_time: datetime.datetime) -> dict:
+    """
+    Fetches busy intervals for many calendars, batching freebusy queries.
+    """
+    calendars = {}
+    if calendar_sync is not None:
+        # Synced calendars are answered locally; only the rest go to Google
+        calendars.update(calendar_sync.freebusy(calendar_ids, start_time, end_time)['calendars'])
+    remaining = [calendar_id for calendar_id in calendar_ids if calendar_id not in calendars]
+    for i in range(0, len(remaining), FREEBUSY_MAX_CALENDARS):
+        chunk = remaining[i:i + FREEBUSY_MAX_CALENDARS]
+        response = calendar_service.freebusy().query(body={
+            'timeMin': start_time.isoformat() + 'Z',
+            'timeMax': end_time.isoformat() + 'Z',
+            'items': [{'id': calendar_id} for calendar_id in chunk],
+        }).execute()
+        calendars.update(response.get('calendars', {}))
+    # Calendars missing from the response have unknown availability, like those Google reports errors for
+    for calendar_id in calendar_ids:
+        calendars.setdefault(calendar_id, {'busy': [], 'errors': [{'domain': 'calendar', 'reason': 'notFound'}]})
+    return {'calendars': calendars}
+
+def build_availability_matrix(calendar_ids: List[str], start_time: datetime.datetime,
+                              end_time: datetime.datetime, slot_minutes: int = 30) -> AvailabilityMatrix:
+    """
+    Builds a packed availability matrix for many users over a horizon.
+    """
+    freebusy = fetch_freebusy(calendar_ids, start_time, end_time)
+    return AvailabilityMatrix.from_freebusy(freebusy, start_time, end_time, slot_minutes)
@@ -0,0 +1,370 @@
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from googleapiclient.errors import HttpError
+from .availability_matrix import to_naive_utc
+import asyncio
+import datetime
+import fcntl
+import logging
+import threading
+import time
+import uuid
+
+# Renew watch channels this long before Google expires them
+CHANNEL_RENEWAL_MARGIN = datetime.timedelta(hours=1)
+
+logger = logging.getLogger(__name__)
+
+
+def _event_time(value: dict) -> datetime.datetime:
+    """
+    Parses an event start/end, treating all-day dates as midnight UTC.
+    """
+    if 'dateTime' in value:
+        return to_naive_utc(datetime.datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00')))
+    return datetime.datetime.fromisoformat(value['date'])
+
+
+class BusyStore:
+    """
+    Local copy of busy intervals per calendar, keyed by event id so incremental
+    sync pages can update or remove individual events.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: Dict[str, Dict[str, Tuple[datetime.datetime, datetime.datetime]]] = {}
+        # Lazily rebuilt per-calendar index: sorted starts, matching ends, longest event
+        self._index: Dict[str, Tuple[List[datetime.datetime], List[datetime.datetime], datetime.timedelta]] = {}
+        self.synced = set()
+
+    def clear(self, calendar_id: str) -> None:
+        with self._lock:
+            self._events[calendar_id] = {}
+            self._index.pop(calendar_id, None)
+            self.synced.discard(calendar_id)
+
+    def set_busy(self, calendar_id: str, event_id: str, start_time: datetime.datetime, end_time: datetime.datetime) -> None:
+        with self._lock:
+            self._events.setdefault(calendar_id, {})[event_id] = (start_time, end_time)
+            self._index.pop(calendar_id, None)
+
+    def remove(self, calendar_id: str, event_id: str) -> None:
+        with self._lock:
+            if self._events.get(calendar_id, {}).pop(event_id, None) is not None:
+                self._index.pop(calendar_id, None)
+
+    def mark_synced(self, calendar_id: str) -> None:
+        with self._lock:
+            self._events.setdefault(calendar_id, {})
+            self.synced.add(calendar_id)
+
+    def mark_unsynced(self, calendar_id: str) -> None:
+        """
+        Stops answering from the local copy, e.g. after a failed sync, without discarding it.
+        """
+        with self._lock:
+            self.synced.discard(calendar_id)
+
+    def _calendar_index(self, calendar_id: str):
+        index = self._index.get(calendar_id)
+        if index is None:
+            intervals = sorted(self._events.get(calendar_id, {}).values())
+            longest = max((end - start for start, end in intervals), default=datetime.timedelta(0))
+            index = ([start for start, _ in intervals], [end for _, end in intervals], longest)
+            self._index[calendar_id] = index
+        return index
+
+    def busy_intervals(self, calendar_id: str, start_time: datetime.datetime,
+                       end_time: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """
+        Returns the busy intervals overlapping a time range, in start order.
+        """
+        with self._lock:
+            starts, ends, longest = self._calendar_index(calendar_id)
+            # Only events starting before end_time can overlap, and none of those
+            # starting earlier than start_time - longest can still be running.
+            i = bisect_left(starts, end_time) - 1
+            overlapping = []
+            while i >= 0 and starts[i] > start_time - longest:
+                if ends[i] > start_time:
+                    overlapping.append((starts[i], ends[i]))
+                i -= 1
+            return overlapping[::-1]
+
+    def is_free(self, calendar_id: str, start_time: datetime.datetime, end_time: datetime.datetime) -> bool:
+        return not self.busy_intervals(calendar_id, start_time, end_time)
+
+
+class CalendarSync:
+    """
+    Keeps a BusyStore current from Google Calendar push notifications.
+
+    Each watched calendar gets a watch channel pointing at the webhook route.
+    A notification only says that something changed, so the calendar is then
+    pulled incrementally with its last sync token; a 410 response means the
+    token expired and the calendar is fully resynced.
+
+    All state lives in the process, so the API must run with a single worker
+    while sync is enabled (see acquire_single_worker_lock).
+    """
+
+    def __init__(self, service, webhook_url: str, channel_token: str = "",
+                 channel_ttl_seconds: int = 7 * 24 * 3600, store: Optional[BusyStore] = None):
+        self.service = service
+        self.webhook_url = webhook_url
+        self.channel_token = channel_token
+        self.channel_ttl_seconds = channel_ttl_seconds
+        self.store = store or BusyStore()
+        self.channels: Dict[str, dict] = {}
+        # Calendars that should be watched, whether or not they currently have a live channel
+        self.wanted = set()
+        self.sync_tokens: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._calendar_locks: Dict[str, threading.Lock] = {}
+
+    def _calendar_lock(self, calendar_id: str) -> threading.Lock:
+        with self._lock:
+            return self._calendar_locks.setdefault(calendar_id, threading.Lock())
+
+    def _channel_for_calendar(self, calendar_id: str) -> Optional[dict]:
+        with self._lock:
+            for channel in self.channels.values():
+                if channel['calendar_id'] == calendar_id:
+                    return channel
+        return None
+
+    def watch(self, calendar_id: str) -> dict:
+        """
+        Registers a watch channel for a calendar and performs its initial sync.
+        """
+        with self._lock:
+            self.wanted.add(calendar_id)
+        channel = self._channel_for_calendar(calendar_id)
+        if channel is not None:
+            return channel
+
+        # Watch before syncing so changes made during the initial sync still trigger a notification
+        channel_id = str(uuid.uuid4())
+        response = self.service.events().watch(calendarId=calendar_id, body={
+            'id': channel_id,
+            'type': 'web_hook',
+            'address': self.webhook_url,
+            'token': self.channel_token,
+            'params': {'ttl': str(self.channel_ttl_seconds)},
+        }).execute()
+        channel = {
+            'channel_id': channel_id,
+            'calendar_id': calendar_id,
+            'resource_id': response.get('resourceId'),
+            'expiration': int(response.get('expiration', (time.time() + self.channel_ttl_seconds) * 1000)),
+        }
+        with self._lock:
+            self.channels[channel_id] = channel
+        self.sync(calendar_id)
+        return channel
+
+    def watch_all(self, calendar_ids: Iterable[str]) -> dict:
+        """
+        Watches many calendars; one unreadable calendar does not stop the others.
+        Failed calendars stay wanted, so renewal keeps retrying them.
+        """
+        watched, failed = [], {}
+        for calendar_id in dict.fromkeys(calendar_ids):
+            try:
+                watched.append(self.watch(calendar_id))
+            except HttpError as e:
+                logger.error(f"Could not watch calendar {calendar_id}: {e}")
+                failed[calendar_id] = str(e)
+        return {"watched": watched, "failed": failed}
+
+    def stop(self, calendar_id: str) -> None:
+        """
+        Stops the watch channel for a calendar and forgets its local state.
+        """
+        channel = self._channel_for_calendar(calendar_id)
+        if channel is None:
+            return
+        self.service.channels().stop(body={'id': channel['channel_id'], 'resourceId': channel['resource_id']}).execute()
+        with self._lock:
+            self.channels.pop(channel['channel_id'], None)
+            self.sync_tokens.pop(calendar_id, None)
+            self.wanted.discard(calendar_id)
+        self.store.clear(calendar_id)
+
+    def renew_channels(self, now: Optional[float] = None) -> List[dict]:
+        """
+        Replaces channels that are about to expire, then retries every wanted
+        calendar that has no channel or whose last sync failed.
+        """
+        now = time.time() if now is None else now
+        cutoff = (now + CHANNEL_RENEWAL_MARGIN.total_seconds()) * 1000
+        with self._lock:
+            expiring = [channel for channel in self.channels.values() if channel['expiration'] <= cutoff]
+        renewed = []
+        for channel in expiring:
+            try:
+                self.service.channels().stop(body={'id': channel['channel_id'], 'resourceId': channel['resource_id']}).execute()
+            except HttpError as e:
+                # Google may reject stopping a channel that has already expired
+                logger.warning(f"Could not stop channel {channel['channel_id']} for {channel['calendar_id']}: {e}")
+            with self._lock:
+                self.channels.pop(channel['channel_id'], None)
+
+        with self._lock:
+            watched = {channel['calendar_id'] for channel in self.channels.values()}
+            missing = sorted(self.wanted - watched)
+            unsynced = sorted(watched - self.store.synced)
+        for calendar_id in missing:
+            try:
+                renewed.append(self.watch(calendar_id))
+            except HttpError as e:
+                # Still wanted, so the next renewal tries again; queries are answered live meanwhile
+                logger.error(f"Could not renew watch channel for {calendar_id}: {e}")
+        for calendar_id in unsynced:
+            try:
+                self.sync(calendar_id)
+            except HttpError as e:
+                logger.error(f"Could not resync calendar {calendar_id}: {e}")
+        return renewed
+
+    async def renew_periodically(self, interval_seconds: float) -> None:
+        """
+        Renews expiring channels forever; meant to run as an application startup task.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await loop.run_in_executor(None, self.renew_channels)
+            except Exception as e:
+                logger.error(f"Calendar channel renewal failed: {e}")
+
+    def is_live(self, calendar_id: str, now: Optional[float] = None) -> bool:
+        """
+        Returns True if a calendar is synced and its watch channel has not expired.
+        Once a channel expires Google stops notifying, so the local copy can go stale.
+        """
+        if calendar_id not in self.store.synced:
+            return False
+        channel = self._channel_for_calendar(calendar_id)
+        now = time.time() if now is None else now
+        return channel is not None and channel['expiration'] > now * 1000
+
+    def resolve_notification(self, headers: Mapping[str, str]) -> Optional[str]:
+        """
+        Validates a push notification and returns the calendar that needs syncing,
+        or None for the initial "sync" handshake message.
+        """
+        headers = {key.lower(): value for key, value in headers.items()}
+        if self.channel_token and headers.get('x-goog-channel-token') != self.channel_token:
+            raise PermissionError("Invalid channel token.")
+        with self._lock:
+            channel = self.channels.get(headers.get('x-goog-channel-id', ''))
+        if channel is None:
+            raise ValueError(f"Unknown channel {headers.get('x-goog-channel-id')}.")
+        if headers.get('x-goog-resource-state') == 'sync':
+            return None
+        return channel['calendar_id']
+
+    def handle_notification(self, headers: Mapping[str, str]) -> Optional[str]:
+        """
+        Validates a push notification and syncs the affected calendar.
+        """
+        calendar_id = self.resolve_notification(headers)
+        if calendar_id is not None:
+            self.sync(calendar_id)
+        return calendar_id
+
+    def sync(self, calendar_id: str) -> None:
+        """
+        Pulls changes for a calendar, incrementally when a sync token is known.
+        """
+        with self._calendar_lock(calendar_id):
+            try:
+                try:
+                    self._sync_pages(calendar_id, self.sync_tokens.get(calendar_id))
+                except HttpError as e:
+                    if e.resp.status != 410:
+                        raise
+                    # The sync token is no longer valid; start over with a full sync
+                    self._sync_pages(calendar_id, None)
+            except Exception:
+                # The local copy may now be behind Google; answer live until a sync succeeds
+                self.store.mark_unsynced(calendar_id)
+                raise
+
+    def _sync_pages(self, calendar_id: str, sync_token: Optional[str]) -> None:
+        if sync_token is None:
+            self.store.clear(calendar_id)
+            self.sync_tokens.pop(calendar_id, None)
+
+        page_token = None
+        while True:
+            params = {'calendarId': calendar_id, 'singleEvents': True, 'showDeleted': True}
+            if sync_token is not None:
+                params['syncToken'] = sync_token
+            if page_token is not None:
+                params['pageToken'] = page_token
+            page = self.service.events().list(**params).execute()
+
+            for event in page.get('items', []):
+                self._apply_event(calendar_id, event)
+
+            page_token = page.get('nextPageToken')
+            if page_token is None:
+                self.sync_tokens[calendar_id] = page.get('nextSyncToken')
+                self.store.mark_synced(calendar_id)
+                return
+
+    def _apply_event(self, calendar_id: str, event: dict) -> None:
+        # Cancelled events and events marked "free" do not block time
+        if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+            self.store.remove(calendar_id, event['id'])
+            return
+        if 'start' not in event or 'end' not in event:
+            return
+        self.store.set_busy(calendar_id, event['id'], _event_time(event['start']), _event_time(event['end']))
+
+    def is_free(self, calendar_id: str, start_time: datetime.datetime, end_time: datetime.datetime) -> Optional[bool]:
+        """
+        Answers availability from the local store, or None if the calendar is not synced
+        or its channel has expired.
+        """
+        if not self.is_live(calendar_id):
+            return None
+        return self.store.is_free(calendar_id, start_time, end_time)
+
+    def freebusy(self, calendar_ids: Iterable[str], start_time: datetime.datetime, end_time: datetime.datetime) -> dict:
+        """
+        Returns freebusy-shaped data for the live synced calendars among calendar_ids.
+        """
+        calendars = {}
+        for calendar_id in calendar_ids:
+            if self.is_live(calendar_id):
+                calendars[calendar_id] = {'busy': [
+                    {'start': start.isoformat() + 'Z', 'end': end.isoformat() + 'Z'}
+                    for start, end in self.store.busy_intervals(calendar_id, start_time, end_time)
+                ]}
+        return {'calendars': calendars}
+
+
+def acquire_single_worker_lock(lock_path: str):
+    """
+    Takes an exclusive lock that only one API process on the host can hold.
+
+    Watch channels, sync tokens and the busy store live in one process, and Google
+    delivers each notification to whichever worker accepts it, so running sync in
+    several workers would leave their stores stale. Startup fails loudly instead.
+    The returned file must stay open for the lifetime of the process.
+    """
+    lock_file = open(lock_path, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise RuntimeError(
+            "Calendar sync requires a single API worker, but another process holds "
+            f"{lock_path}. Run uvicorn with one worker or disable calendar_sync."
+        )
+    return lock_file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
 from pydantic import BaseModel
 from typing import List
 import datetime
 from schedule_manager.superuser_manager import add_superuser, get_superusers
-from schedule_manager.group_manager import create_group, list_groups
+from schedule_manager.group_manager import create_group, list_groups, groups
+from schedule_manager.calendar_service import build_availability_matrix, calendar_sync
+from schedule_manager.availability_matrix import SessionRequest, assign_sessions, count_slots, to_naive_utc
 
 # Router setup
 router = APIRouter()
@@ -16,6 +18,18 @@ class GroupRequest(BaseModel):
     group_name: str
     members: List[str]
 
+class CohortSession(BaseModel):
+    session_id: str
+    duration_minutes: int
+    required: List[str]
+    optional: List[str] = []
+
+class CohortScheduleRequest(BaseModel):
+    horizon_start: datetime.datetime
+    horizon_end: datetime.datetime
+    slot_minutes: int = 30
+    sessions: List[CohortSession]
+
 # Superuser Management Endpoints
 @router.post("/add-superuser")
 async def add_superuser_endpoint(request: SuperuserRequest):
@@ -43,3 +57,68 @@ async def list_groups_endpoint():
     Endpoint to list all groups and their members.
     """
     return list_groups()
+
+# Cohort Scheduling Endpoints
+@router.post("/schedule-cohort")
+def schedule_cohort_endpoint(request: CohortScheduleRequest):
+    """
+    Endpoint to place many sessions at once without double-booking attendees.
+    Defined with a plain def so the blocking freebusy fetch runs in the threadpool.
+    """
+    calendar_ids = list(dict.fromkeys(
+        user_id for session in request.sessions for user_id in session.required + session.optional
+    ))
+    horizon_start, horizon_end = to_naive_utc(request.horizon_start), to_naive_utc(request.horizon_end)
+    try:
+        # Reject oversized horizons before fetching anything from Google
+        count_slots(horizon_start, horizon_end, request.slot_minutes, len(calendar_ids))
+        matrix = build_availability_matrix(calendar_ids, horizon_start, horizon_end, request.slot_minutes)
+        result = assign_sessions(matrix, [SessionRequest(**session.dict()) for session in request.sessions])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "assignments": [
+            {
+                "session_id": assignment.session_id,
+                "start": assignment.start,
+                "end": assignment.end,
+                "attendees": assignment.attendees,
+            }
+            for assignment in result["assignments"]
+        ],
+        "unscheduled": result["unscheduled"],
+    }
+
+# Calendar Sync Endpoints
+@router.post("/start-calendar-sync")
+def start_calendar_sync_endpoint():
+    """
+    Endpoint to watch the calendars of all superusers and group members and renew expiring channels.
+    """
+    if calendar_sync is None:
+        raise HTTPException(status_code=404, detail="Calendar sync is not enabled.")
+    calendar_ids = get_superusers() + [member for members in groups.values() for member in members]
+    calendar_sync.renew_channels()
+    result = calendar_sync.watch_all(calendar_ids)
+    return {
+        "message": f"Watching {len(result['watched'])} calendars, {len(result['failed'])} failed.",
+        "calendars": [channel['calendar_id'] for channel in result['watched']],
+        "failed": result['failed'],
+    }
+
+@router.post("/calendar-notifications")
+async def calendar_notifications_endpoint(request: Request, background_tasks: BackgroundTasks):
+    """
+    Webhook for Google Calendar push notifications; syncs the changed calendar in the background.
+    """
+    if calendar_sync is None:
+        raise HTTPException(status_code=404, detail="Calendar sync is not enabled.")
+    try:
+        calendar_id = calendar_sync.resolve_notification(request.headers)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if calendar_id is not None:
+        background_tasks.add_task(calendar_sync.sync, calendar_id)
+    return {"message": "Notification received."}
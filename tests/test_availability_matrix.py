@@ -0,0 +1,92 @@
+import pytest
+from datetime import datetime, timedelta
+from schedule_manager.availability_matrix import AvailabilityMatrix, SessionRequest, assign_sessions
+
+HORIZON_START = datetime(2025, 1, 6, 9, 0)
+HORIZON_END = datetime(2025, 1, 6, 13, 0)  # 8 slots of 30 minutes
+
+@pytest.fixture
+def matrix():
+    freebusy = {
+        'calendars': {
+            'mentor@domain.com': {'busy': [{'start': '2025-01-06T09:00:00Z', 'end': '2025-01-06T10:00:00Z'}]},
+            'hire1@domain.com': {'busy': [{'start': '2025-01-06T10:15:00Z', 'end': '2025-01-06T10:45:00Z'}]},
+            'hire2@domain.com': {'busy': []},
+        }
+    }
+    return AvailabilityMatrix.from_freebusy(freebusy, HORIZON_START, HORIZON_END)
+
+# Test for building the bitmap from freebusy data
+def test_from_freebusy_marks_overlapping_slots(matrix):
+    assert matrix.n_slots == 8
+    assert matrix.free_slots('mentor@domain.com').tolist() == [False, False, True, True, True, True, True, True]
+    # A busy interval that straddles slot boundaries blocks both slots it touches
+    assert matrix.free_slots('hire1@domain.com').tolist() == [True, True, False, False, True, True, True, True]
+
+# Test for group AND and popcount queries
+def test_all_free_and_free_counts(matrix):
+    users = ['mentor@domain.com', 'hire1@domain.com', 'hire2@domain.com']
+    assert matrix.all_free(users).tolist() == [False, False, False, False, True, True, True, True]
+    assert matrix.free_counts(users).tolist() == [2, 2, 2, 2, 3, 3, 3, 3]
+
+def test_unknown_user_raises(matrix):
+    with pytest.raises(ValueError):
+        matrix.all_free(['nobody@domain.com'])
+
+# Test for ranking windows by optional attendance
+def test_best_windows_prefers_optional_attendance(matrix):
+    windows = matrix.best_windows(['mentor@domain.com'], 60, optional=['hire1@domain.com', 'hire2@domain.com'])
+    assert windows[0]['start'] == HORIZON_START + timedelta(hours=2)
+    assert windows[0]['optional_free'] == 2
+
+# Tests for the batch assignment solver
+def test_assign_sessions_does_not_double_book(matrix):
+    sessions = [
+        SessionRequest('intro', 60, ['mentor@domain.com'], ['hire1@domain.com', 'hire2@domain.com']),
+        SessionRequest('tools', 60, ['mentor@domain.com'], ['hire2@domain.com']),
+    ]
+    result = assign_sessions(matrix, sessions)
+
+    assert result['unscheduled'] == []
+    first, second = sorted(result['assignments'], key=lambda a: a.start)
+    assert first.end <= second.start
+    # The input matrix is left untouched
+    assert matrix.free_slots('mentor@domain.com').sum() == 6
+
+def test_assign_sessions_reports_unschedulable(matrix):
+    sessions = [SessionRequest('long', 210, ['mentor@domain.com'])]
+    result = assign_sessions(matrix, sessions)
+
+    assert result['assignments'] == []
+    assert result['unscheduled'] == ['long']
+
+# Test that unreadable calendars are not treated as free
+def test_from_freebusy_rejects_calendars_with_errors():
+    freebusy = {
+        'calendars': {
+            'mentor@domain.com': {'busy': []},
+            'private@domain.com': {'busy': [], 'errors': [{'domain': 'global', 'reason': 'notFound'}]},
+        }
+    }
+    with pytest.raises(ValueError, match='private@domain.com'):
+        AvailabilityMatrix.from_freebusy(freebusy, HORIZON_START, HORIZON_END)
+
+# Test that a trailing partial slot is never offered
+def test_uneven_horizon_drops_partial_slot():
+    matrix = AvailabilityMatrix(['mentor@domain.com'], HORIZON_START, HORIZON_START + timedelta(minutes=75))
+    assert matrix.n_slots == 2
+
+    sessions = [SessionRequest(f"s{i}", 30, ['mentor@domain.com']) for i in range(3)]
+    result = assign_sessions(matrix, sessions)
+
+    assert all(a.end <= HORIZON_START + timedelta(minutes=75) for a in result['assignments'])
+    assert len(result['unscheduled']) == 1
+
+# Test the size limits that bound memory per request
+def test_matrix_size_limits():
+    with pytest.raises(ValueError, match='at least'):
+        AvailabilityMatrix(['a'], HORIZON_START, HORIZON_END, slot_minutes=1)
+    with pytest.raises(ValueError, match='maximum'):
+        AvailabilityMatrix(['a'], HORIZON_START, HORIZON_START + timedelta(days=365), slot_minutes=5)
+    with pytest.raises(ValueError, match='cells'):
+        AvailabilityMatrix([f"u{i}" for i in range(2000)], HORIZON_START, HORIZON_START + timedelta(days=90), slot_minutes=15)
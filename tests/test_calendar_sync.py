@@ -0,0 +1,236 @@
+import httplib2
+import pytest
+from datetime import datetime
+from googleapiclient.errors import HttpError
+import os
+import tempfile
+from schedule_manager.calendar_sync import CalendarSync, acquire_single_worker_lock
+
+class FakeRequest:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+class FakeCalendarApi:
+    """
+    Local stand-in for the Calendar API: keeps an event log per calendar, serves
+    paged full and incremental syncs, and emits push notifications to a subscriber.
+    """
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.expiration = '4102444800000'
+        self.reject_stop = False
+        self.list_error = None  # HTTP status that list() fails with, if set
+        self.unwatchable = set()
+        self.log = {}  # calendar_id -> list of event versions, oldest first
+        self.watched = {}
+        self.expired_tokens = set()
+        self.list_calls = []
+        self.subscriber = None
+
+    # Resource accessors mirroring the discovery client
+    def events(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def watch(self, calendarId, body):
+        if calendarId in self.unwatchable:
+            return FakeRequest(HttpError(httplib2.Response({'status': 404}), b'Not Found'))
+        self.watched[body['id']] = calendarId
+        return FakeRequest({'resourceId': f"resource-{calendarId}", 'expiration': self.expiration})
+
+    def stop(self, body):
+        if body['id'] not in self.watched or self.reject_stop:
+            return FakeRequest(HttpError(httplib2.Response({'status': 404}), b'Channel not found'))
+        self.watched.pop(body['id'])
+        return FakeRequest({})
+
+    def list(self, calendarId, singleEvents, showDeleted, syncToken=None, pageToken=None):
+        self.list_calls.append((calendarId, syncToken, pageToken))
+        if self.list_error:
+            return FakeRequest(HttpError(httplib2.Response({'status': self.list_error}), b'Upstream error'))
+        if syncToken in self.expired_tokens:
+            return FakeRequest(HttpError(httplib2.Response({'status': 410}), b'Sync token expired'))
+        log = self.log.get(calendarId, [])
+        since = int(syncToken) if syncToken else 0
+        if syncToken:
+            changes = log[since:]
+        else:
+            # A full sync only returns the latest version of live events
+            latest = {event['id']: event for event in log}
+            changes = [event for event in latest.values() if event.get('status') != 'cancelled']
+        offset = int(pageToken) if pageToken else 0
+        page = {'items': changes[offset:offset + self.page_size]}
+        if offset + self.page_size < len(changes):
+            page['nextPageToken'] = str(offset + self.page_size)
+        else:
+            page['nextSyncToken'] = str(len(log))
+        return FakeRequest(page)
+
+    def change(self, calendar_id, event):
+        self.log.setdefault(calendar_id, []).append(event)
+        for channel_id, watched in self.watched.items():
+            if watched == calendar_id and self.subscriber:
+                self.subscriber({
+                    'X-Goog-Channel-ID': channel_id,
+                    'X-Goog-Channel-Token': 'secret',
+                    'X-Goog-Resource-State': 'exists',
+                })
+
+def busy_event(event_id, start, end, **extra):
+    return {'id': event_id, 'start': {'dateTime': start}, 'end': {'dateTime': end}, **extra}
+
+@pytest.fixture
+def api():
+    api = FakeCalendarApi()
+    for i in range(3):
+        api.change('user@domain.com', busy_event(f"e{i}", f"2025-01-06T{9 + i:02d}:00:00Z", f"2025-01-06T{9 + i:02d}:30:00Z"))
+    return api
+
+@pytest.fixture
+def sync(api):
+    sync = CalendarSync(api, webhook_url="https://example.com/calendar-notifications", channel_token="secret")
+    api.subscriber = sync.handle_notification
+    return sync
+
+# Test the initial paged full sync
+def test_watch_performs_full_sync(api, sync):
+    sync.watch('user@domain.com')
+
+    assert [call[2] for call in api.list_calls] == [None, '2']
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9, 15), datetime(2025, 1, 6, 9, 45)) is False
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9, 30), datetime(2025, 1, 6, 10, 0)) is True
+    # Unsynced calendars fall back to a live check
+    assert sync.is_free('other@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is None
+
+# Test that notifications trigger incremental syncs with the stored token
+def test_notifications_apply_incremental_changes(api, sync):
+    sync.watch('user@domain.com')
+    api.list_calls.clear()
+
+    api.change('user@domain.com', busy_event('new', '2025-01-06T14:00:00Z', '2025-01-06T15:00:00Z'))
+    api.change('user@domain.com', {'id': 'e0', 'status': 'cancelled'})
+
+    assert [call[1] for call in api.list_calls] == ['3', '4']
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 14, 30), datetime(2025, 1, 6, 14, 45)) is False
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9, 0), datetime(2025, 1, 6, 9, 30)) is True
+
+def test_transparent_events_do_not_block(api, sync):
+    sync.watch('user@domain.com')
+    api.change('user@domain.com', busy_event('e1', '2025-01-06T10:00:00Z', '2025-01-06T10:30:00Z', transparency='transparent'))
+
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 10, 0), datetime(2025, 1, 6, 10, 30)) is True
+
+# Test recovery from an expired sync token
+def test_expired_sync_token_triggers_full_resync(api, sync):
+    sync.watch('user@domain.com')
+    api.expired_tokens.add(sync.sync_tokens['user@domain.com'])
+    api.list_calls.clear()
+
+    api.change('user@domain.com', busy_event('late', '2025-01-06T16:00:00Z', '2025-01-06T17:00:00Z'))
+
+    assert api.list_calls[1][1] is None
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 16), datetime(2025, 1, 6, 16, 30)) is False
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 9, 30)) is False
+
+def test_notification_validation(api, sync):
+    channel = sync.watch('user@domain.com')
+    headers = {'X-Goog-Channel-ID': channel['channel_id'], 'X-Goog-Channel-Token': 'secret', 'X-Goog-Resource-State': 'sync'}
+
+    assert sync.resolve_notification(headers) is None
+    with pytest.raises(PermissionError):
+        sync.resolve_notification({**headers, 'X-Goog-Channel-Token': 'wrong'})
+    with pytest.raises(ValueError):
+        sync.resolve_notification({**headers, 'X-Goog-Channel-ID': 'unknown'})
+
+def test_stop_and_freebusy(api, sync):
+    sync.watch('user@domain.com')
+    freebusy = sync.freebusy(['user@domain.com', 'other@domain.com'], datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10))
+    assert freebusy == {'calendars': {'user@domain.com': {'busy': [
+        {'start': '2025-01-06T09:00:00Z', 'end': '2025-01-06T09:30:00Z'},
+    ]}}}
+
+    sync.stop('user@domain.com')
+    assert api.watched == {}
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is None
+
+# Tests for channel expiry and renewal
+def test_expired_channel_falls_back_to_live_checks(api, sync):
+    api.expiration = '1000'  # Expired long ago
+    sync.watch('user@domain.com')
+
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is None
+    assert sync.freebusy(['user@domain.com'], datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) == {'calendars': {}}
+
+def test_renewal_continues_when_stop_is_rejected(api, sync):
+    api.expiration = '1000'
+    old = sync.watch('user@domain.com')
+    api.reject_stop = True
+    api.expiration = '4102444800000'
+
+    renewed = sync.renew_channels()
+
+    assert [channel['calendar_id'] for channel in renewed] == ['user@domain.com']
+    assert old['channel_id'] not in sync.channels
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is False
+
+# Test that a failed incremental sync stops local answers until a sync succeeds
+def test_failed_sync_falls_back_to_live_checks(api, sync):
+    sync.watch('user@domain.com')
+    api.list_error = 500
+    api.subscriber = None
+    api.change('user@domain.com', busy_event('new', '2025-01-06T14:00:00Z', '2025-01-06T15:00:00Z'))
+
+    with pytest.raises(HttpError):
+        sync.sync('user@domain.com')
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 14), datetime(2025, 1, 6, 14, 30)) is None
+
+    # The next renewal pass resyncs it
+    api.list_error = None
+    sync.renew_channels()
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 14), datetime(2025, 1, 6, 14, 30)) is False
+
+# Test that a failed renewal is retried on the next pass
+def test_failed_renewal_is_retried(api, sync):
+    api.expiration = '1000'
+    sync.watch('user@domain.com')
+    api.unwatchable.add('user@domain.com')
+
+    assert sync.renew_channels() == []
+    assert sync.channels == {}
+
+    api.unwatchable.clear()
+    api.expiration = '4102444800000'
+    renewed = sync.renew_channels()
+    assert [channel['calendar_id'] for channel in renewed] == ['user@domain.com']
+    assert sync.is_free('user@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is False
+
+# Test that one unreadable calendar does not block the rest
+def test_watch_all_reports_failures(api, sync):
+    api.unwatchable.add('ext@other.com')
+    api.change('b@domain.com', busy_event('b1', '2025-01-06T09:00:00Z', '2025-01-06T10:00:00Z'))
+
+    result = sync.watch_all(['ext@other.com', 'user@domain.com', 'b@domain.com'])
+
+    assert [channel['calendar_id'] for channel in result['watched']] == ['user@domain.com', 'b@domain.com']
+    assert list(result['failed']) == ['ext@other.com']
+    assert sync.is_free('b@domain.com', datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 10)) is False
+
+# Test that only one worker can run calendar sync
+def test_single_worker_lock():
+    lock_path = os.path.join(tempfile.mkdtemp(), 'calendar-sync.lock')
+    held = acquire_single_worker_lock(lock_path)
+    try:
+        with pytest.raises(RuntimeError, match='single API worker'):
+            # A separate open file description conflicts like a second worker process would
+            acquire_single_worker_lock(lock_path)
+    finally:
+        held.close()
+    acquire_single_worker_lock(lock_path).close()
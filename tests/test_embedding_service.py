@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import tempfile
+import numpy as np
+from unittest.mock import patch
+from finetuning import embedding_service
+from finetuning.embedding_service import EmbeddingClient, MicroBatcher, serve
+
+def fake_encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+    return encode
+
+# Test that concurrent requests within the window share one model call
+def test_micro_batcher_groups_concurrent_requests():
+    calls = []
+
+    async def scenario():
+        batcher = MicroBatcher(fake_encoder(calls), window_ms=50)
+        batcher.start()
+        results = await asyncio.gather(batcher.embed(["a"]), batcher.embed(["bb", "ccc"]))
+        await batcher.stop()
+        return results
+
+    first, second = asyncio.run(scenario())
+    assert first == [[1.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+    assert calls == [["a", "bb", "ccc"]]
+
+def test_micro_batcher_respects_max_batch_size():
+    calls = []
+
+    async def scenario():
+        batcher = MicroBatcher(fake_encoder(calls), window_ms=50, max_batch_size=2)
+        batcher.start()
+        await asyncio.gather(*(batcher.embed([text]) for text in ["a", "b", "c"]))
+        await batcher.stop()
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in calls] == [2, 1]
+
+# Test the Unix socket protocol end to end with the LangChain client
+def test_client_embeds_through_sidecar():
+    calls = []
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+
+    async def scenario():
+        server = await serve(MicroBatcher(fake_encoder(calls), window_ms=1), socket_path)
+        client = EmbeddingClient(socket_path)
+        loop = asyncio.get_running_loop()
+        query = await loop.run_in_executor(None, client.embed_query, "hello")
+        documents = await loop.run_in_executor(None, client.embed_documents, ["a", "bb"])
+        server.close()
+        await server.wait_closed()
+        return query, documents
+
+    query, documents = asyncio.run(scenario())
+    assert query == [5.0, 1.0]
+    assert documents == [[1.0, 1.0], [2.0, 1.0]]
+
+# Test that large ingestion requests are split into bounded pieces
+def test_client_splits_large_requests():
+    calls = []
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+
+    async def scenario():
+        server = await serve(MicroBatcher(fake_encoder(calls), window_ms=0), socket_path)
+        client = EmbeddingClient(socket_path, max_batch_size=4)
+        vectors = await asyncio.get_running_loop().run_in_executor(None, client.embed_documents, ["x"] * 10)
+        server.close()
+        await server.wait_closed()
+        return vectors
+
+    vectors = asyncio.run(scenario())
+    assert len(vectors) == 10
+    assert [len(batch) for batch in calls] == [4, 4, 2]
+
+# Test that an oversized line is answered with an error instead of a dropped connection
+def test_server_reports_oversized_request():
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+
+    async def scenario():
+        server = await serve(MicroBatcher(fake_encoder([]), window_ms=0), socket_path)
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(b'{"texts": ["' + b"x" * (2 ** 24 + 10) + b'"]}\n')
+        response = json.loads(await reader.readline())
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    assert "exceeds" in asyncio.run(scenario())["error"]
+
+# Test the in-process fallback and that the sidecar is retried afterwards
+def test_client_falls_back_and_retries_sidecar():
+    class FakeModel:
+        def encode(self, texts, batch_size, normalize_embeddings):
+            return np.zeros((len(texts), 2))
+
+    calls = []
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+    client = EmbeddingClient(socket_path)
+
+    with patch.object(embedding_service, "load_model", return_value=FakeModel()):
+        assert client.embed_query("offline") == [0.0, 0.0]
+
+    async def scenario():
+        server = await serve(MicroBatcher(fake_encoder(calls), window_ms=0), socket_path)
+        vector = await asyncio.get_running_loop().run_in_executor(None, client.embed_query, "online")
+        server.close()
+        await server.wait_closed()
+        return vector
+
+    assert asyncio.run(scenario()) == [6.0, 1.0]
+    assert calls == [["online"]]
+
+# Test that waiting for the sidecar is bounded
+def test_wait_for_service_times_out_and_succeeds():
+    socket_path = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+    assert embedding_service.wait_for_service(socket_path, timeout=0) is False
+
+    async def scenario():
+        server = await serve(MicroBatcher(fake_encoder([]), window_ms=0), socket_path)
+        ready = await asyncio.get_running_loop().run_in_executor(None, embedding_service.wait_for_service, socket_path, 1)
+        server.close()
+        await server.wait_closed()
+        return ready
+
+    assert asyncio.run(scenario()) is True
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import pytest
+from finetuning.llm_scheduler import LLMScheduler, LLMOverloadedError, INTERACTIVE, AGENT, BACKGROUND
+
+def make_scheduler(**classes):
+    return LLMScheduler(max_concurrency=1, classes=classes)
+
+# Test that a freed slot goes to the highest-priority queued work
+def test_interactive_work_runs_before_background():
+    scheduler = make_scheduler()
+    order = []
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(scheduler.run(BACKGROUND, release.wait))
+        await asyncio.sleep(0.05)
+        background = asyncio.ensure_future(scheduler.run(BACKGROUND, order.append, "background"))
+        interactive = asyncio.ensure_future(scheduler.run(INTERACTIVE, order.append, "interactive"))
+        await asyncio.sleep(0.05)
+        release.set()
+        await asyncio.gather(blocker, background, interactive)
+
+    asyncio.run(scenario())
+    assert order == ["interactive", "background"]
+
+# Test that a full queue is rejected immediately with a retry hint
+def test_full_queue_is_rejected():
+    scheduler = make_scheduler(agent={"max_queue": 1})
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(scheduler.run(AGENT, release.wait))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(scheduler.run(AGENT, lambda: None))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloadedError) as error:
+            await scheduler.run(AGENT, lambda: None)
+        release.set()
+        await asyncio.gather(blocker, queued)
+        return error.value
+
+    error = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert scheduler.metrics()[AGENT]["rejected"] == 1
+
+# Test deadline-aware admission
+def test_unmeetable_deadline_is_rejected():
+    scheduler = make_scheduler()
+    with pytest.raises(LLMOverloadedError):
+        scheduler.call(INTERACTIVE, lambda: None, timeout=0.1)
+
+def test_sync_call_and_metrics_export():
+    scheduler = make_scheduler()
+    assert scheduler.call(INTERACTIVE, lambda x: x * 2, 21, timeout=5) == 42
+
+    metrics = scheduler.metrics()[INTERACTIVE]
+    assert metrics["completed"] == 1
+    assert metrics["dispatched"] == 1
+    assert metrics["queue_depth"] == 0
+    report = scheduler.render_prometheus()
+    assert 'llm_queue_depth{priority="interactive"} 0' in report
+    assert 'llm_queue_wait_seconds_count{priority="interactive"} 1' in report
@@ -0,0 +1,91 @@
+from api.speculation import SpeculationBudget
+
+# Test that speculation stays off unless enabled
+def test_disabled_budget_never_speculates():
+    budget = SpeculationBudget(enabled=False)
+    assert budget.try_acquire() is False
+    assert budget.stats["speculated"] == 0
+
+# Test the per-minute cap on extra upstream calls
+def test_budget_caps_speculations_per_minute():
+    budget = SpeculationBudget(enabled=True, max_per_minute=2)
+    assert budget.try_acquire(now=0.0) is True
+    assert budget.try_acquire(now=1.0) is True
+    assert budget.try_acquire(now=2.0) is False
+    # The window slides after a minute
+    assert budget.try_acquire(now=60.5) is True
+    assert budget.stats["skipped"] == 1
+
+# Test that speculation is skipped while interactive work is queueing
+def test_budget_skips_when_queue_is_busy():
+    budget = SpeculationBudget(enabled=True, max_queue_depth=0)
+    assert budget.try_acquire(queue_depth=3) is False
+
+def test_outcomes_are_reported():
+    budget = SpeculationBudget(enabled=True)
+    budget.record_used(0.4)
+    budget.record_wasted()
+
+    report = budget.render_prometheus()
+    assert 'llm_speculation_total{outcome="used"} 1' in report
+    assert 'llm_speculation_total{outcome="wasted"} 1' in report
+    assert "llm_speculation_latency_saved_seconds_sum 0.4" in report
+
+# Tests for the speculative request path in api.routes
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+from finetuning.llm_scheduler import LLMScheduler
+
+CLASSIFY_PROMPT = 'Is the following user query related to scheduling a meeting? Respond with "Yes" or "No".'
+
+def fake_watsonx(intent, calls, delay=0.1):
+    def process_query_with_watsonx(prompt):
+        kind = "classify" if "Respond with" in prompt else "meeting" if "wants to schedule" in prompt else "generic"
+        calls.append((kind, time.monotonic()))
+        time.sleep(delay)
+        return {"classify": intent, "meeting": "meeting answer", "generic": "generic answer"}[kind]
+    return process_query_with_watsonx
+
+@pytest.fixture
+def speculative_routes():
+    import api.routes as routes
+    budget = SpeculationBudget(enabled=True)
+    with patch.object(routes, "speculation_budget", budget), \
+         patch.object(routes, "llm_scheduler", LLMScheduler(max_concurrency=4)):
+        yield routes, budget
+
+def test_meeting_intent_discards_speculative_answer(speculative_routes):
+    routes, budget = speculative_routes
+    calls = []
+    request = routes.UserRequest(user_input="Can we meet on Monday?", duration=30)
+
+    with patch.object(routes, "process_query_with_watsonx", fake_watsonx("Yes", calls)):
+        response = asyncio.run(routes.answer_speculatively(request, [], CLASSIFY_PROMPT))
+
+    assert response == "meeting answer"
+    # The generic answer was started alongside classification, then thrown away
+    kinds = [kind for kind, _ in calls]
+    assert sorted(kinds[:2]) == ["classify", "generic"]
+    assert kinds[2] == "meeting"
+    assert budget.stats["wasted"] == 1
+    assert budget.stats["used"] == 0
+
+def test_non_meeting_intent_uses_speculative_answer(speculative_routes):
+    routes, budget = speculative_routes
+    calls = []
+    request = routes.UserRequest(user_input="What should I read first?", duration=30)
+
+    with patch.object(routes, "process_query_with_watsonx", fake_watsonx("No", calls)):
+        started = time.monotonic()
+        response = asyncio.run(routes.answer_speculatively(request, [], CLASSIFY_PROMPT))
+        elapsed = time.monotonic() - started
+
+    assert response == "generic answer"
+    assert sorted(kind for kind, _ in calls) == ["classify", "generic"]
+    # Both calls overlapped, so the request took about one round trip instead of two
+    assert elapsed < 0.18
+    assert budget.stats["used"] == 1
+    assert budget.stats["wasted"] == 0
+    assert budget.stats["latency_saved_seconds_sum"] >= 0.05